@@ -1,42 +1,240 @@
+import asyncio
+import hashlib
+import threading
+import aiohttp
+import orjson
 import streamlit as st
 import requests
-from datetime import datetime
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import json
 
-# Define available endpoints
-ENDPOINTS = {
-    "Generate Hotel Description": "/generate-hotel-reservation",
-    "Generate Master Itinerary": "/generate-master-itinerary",
-    "Generate Extra Daily Contents": "/generate-extra-daily-contents",
-    "Generate Free Format Content": "/generate-free-format-content"
-}
+@st.cache_resource
+def _config():
+    # Define available endpoints
+    endpoints = {
+        "Generate Hotel Description": "/generate-hotel-reservation",
+        "Generate Master Itinerary": "/generate-master-itinerary",
+        "Generate Extra Daily Contents": "/generate-extra-daily-contents",
+        "Generate Free Format Content": "/generate-free-format-content"
+    }
+
+    # Define available models
+    models = {
+        "Claude 3.5 Sonnet v2": None,  # Default model doesn't need a model_id
+        "LLama 3.3 70b Instruct": "us.meta.llama3-3-70b-instruct-v1:0"
+    }
+
+    return {
+        "ENDPOINTS": endpoints,
+        "MODELS": models,
+        "endpoint_keys": tuple(endpoints),
+        # Endpoints sharing the destination/dates form, so one payload fits them all
+        "batch_endpoint_keys": tuple(k for k in endpoints if k != "Generate Free Format Content"),
+        "model_keys": tuple(models)
+    }
+
+# Built once per process instead of on every rerun
+CONFIG = _config()
+ENDPOINTS = CONFIG["ENDPOINTS"]
+MODELS = CONFIG["MODELS"]
+
+BASE_URL = "https://m0zpgns4ce.execute-api.us-east-1.amazonaws.com/stg-public"
+
+# Client-side limits, checked before any request is sent
+MAX_DESTINATION_LENGTH = 200
+MAX_PROMPT_LENGTH = 8000
+MAX_PLACES_VISITED_LENGTH = 2000
+
+# Regenerated responses kept per browser session
+RESP_CACHE_SIZE = 16
+
+@st.cache_resource
+def get_session(api_key):
+    # Reuse one pooled session per API key so reruns skip the TCP+TLS handshake
+    session = requests.Session()
+    session.headers.update({
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip, br",  # br is decoded when the brotli package is installed
+        "x-api-key": api_key
+    })
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        # Only failed connections are retried: urllib3 never retries a POST once it was
+        # sent, which keeps an LLM generation from running twice
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount("https://", adapter)
+    return session
+
+def _do_post(endpoint, data, api_key):
+    api_url = f"{BASE_URL}{endpoint}"
+    session = get_session(api_key)
+
+    response = session.post(api_url, json=data, timeout=(5, 120))
+    response.raise_for_status()
+
+    # Compare the MIME type only, as aiohttp's content_type does, so a charset parameter is accepted
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        return orjson.loads(response.content)
+    else:
+        raise ValueError("Unexpected response format from API. Expected JSON.")
 
-# Define available models
-MODELS = {
-    "Claude 3.5 Sonnet v2": None,  # Default model doesn't need a model_id
-    "LLama 3.3 70b Instruct": "us.meta.llama3-3-70b-instruct-v1:0"
-}
+# Only successful responses are cached; errors raise and are never stored.
+# The raw key is prefixed with an underscore so Streamlit leaves it out of the cache key.
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_post(endpoint, payload_json, api_key_hash, _api_key):
+    return _do_post(endpoint, json.loads(payload_json), _api_key)
 
+def _canonical_json(data):
+    # Stable, compact encoding so equal payloads always produce the same cache key
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+# Regeneration never comes through here: it goes through regenerate() on the aiohttp path
 def call_api(endpoint, data, api_key):
-    base_url = "https://m0zpgns4ce.execute-api.us-east-1.amazonaws.com/stg-public"
-    api_url = f"{base_url}{endpoint}"
+    try:
+        payload_json = _canonical_json(data)
+        api_key_hash = hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+        return _cached_post(endpoint, payload_json, api_key_hash, api_key)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {"error": str(e)}
+
+def call_api_stream(endpoint, data, api_key):
+    api_url = f"{BASE_URL}{endpoint}"
+    session = get_session(api_key)
+
+    # Ask the backend for server-sent events and yield text chunks as they arrive
+    with session.post(
+        api_url,
+        json={**data, "stream": True},
+        # Compressed event streams tend to be buffered, so ask for identity here
+        headers={"Accept": "text/event-stream", "Accept-Encoding": "identity"},
+        stream=True,
+        timeout=(5, 120)
+    ) as response:
+        response.raise_for_status()
+        # SSE is UTF-8 by spec; without a charset requests would fall back to ISO-8859-1
+        response.encoding = "utf-8"
+
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            frame = line[len("data:"):].strip()
+            if frame == "[DONE]":
+                break
+            payload = orjson.loads(frame)
+            if isinstance(payload, str):
+                # A bare JSON string frame is the text chunk itself
+                if payload:
+                    yield payload
+                continue
+            if not isinstance(payload, dict):
+                continue
+            if "error" in payload:
+                raise requests.exceptions.RequestException(payload["error"])
+            chunk = payload.get("token") or payload.get("result")
+            if chunk:
+                yield chunk
+
+async def _create_aio_session():
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300),
+        timeout=aiohttp.ClientTimeout(sock_connect=5, sock_read=120)
+    )
+
+# The loop and the aiohttp session bound to it are created and cached together,
+# so the session is always used on the loop it belongs to
+@st.cache_resource
+def get_aio_runtime():
+    # A single long-lived loop on a daemon thread keeps the session's connection pool
+    # alive across Streamlit reruns
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    session = asyncio.run_coroutine_threadsafe(_create_aio_session(), loop).result()
+    return loop, session
+
+def get_event_loop():
+    return get_aio_runtime()[0]
+
+def get_aio_session():
+    return get_aio_runtime()[1]
+
+def run_async(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+async def _post(session, endpoint, data, api_key):
+    api_url = f"{BASE_URL}{endpoint}"
     headers = {
         "Content-Type": "application/json",
         "x-api-key": api_key
     }
 
     try:
-        response = requests.post(api_url, json=data, headers=headers)
-        response.raise_for_status()
+        async with session.post(api_url, json=data, headers=headers) as response:
+            response.raise_for_status()
 
-        if response.headers.get("Content-Type") == "application/json":
-            return response.json()
-        else:
-            return {"error": "Unexpected response format from API. Expected JSON."}
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
+            if response.content_type == "application/json":
+                return await response.json(loads=orjson.loads)
+            else:
+                return {"error": "Unexpected response format from API. Expected JSON."}
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return {"error": str(e) or type(e).__name__}
+
+def _init_state():
+    # Form values plus generation state, set once per browser session
+    defaults = {
+        "form_values": {},
+        "content_generated": False,
+        "generated_content": None,
+        "resp_cache": OrderedDict(),
+        "last_feedback": None
+    }
+    for key, value in defaults.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+
+async def _post_all(session, endpoints, data, api_key):
+    # Fire every request at once so total latency is the slowest call, not the sum
+    return await asyncio.gather(
+        *[_post(session, endpoint, data, api_key) for endpoint in endpoints],
+        return_exceptions=True
+    )
+
+def regenerate(endpoint, data, api_key):
+    # Entries are keyed on the request minus generated_content and remember the content
+    # they were built from. A hit is served only for the same request on that same base,
+    # or for a repeat click whose current content is exactly that entry's result, so a
+    # hit never rolls the content back to a result built from an older base.
+    feedback = data["user_feedback"]
+    cache = st.session_state.resp_cache
+    if feedback != st.session_state.last_feedback:
+        cache.clear()
+        st.session_state.last_feedback = feedback
+
+    source = data["generated_content"]
+    key_fields = {k: v for k, v in data.items() if k != "generated_content"}
+    payload = _canonical_json({"endpoint": endpoint, **key_fields})
+    key = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    if key in cache:
+        cached_source, cached_response = cache[key]
+        if source in (cached_source, cached_response.get("result", "No content available")):
+            cache.move_to_end(key)
+            return cached_response
+
+    response = run_async(_post(get_aio_session(), endpoint, data, api_key))
+    if "error" not in response:
+        cache[key] = (source, response)
+        cache.move_to_end(key)
+        if len(cache) > RESP_CACHE_SIZE:
+            cache.popitem(last=False)
+    return response
 
 # Streamlit UI
+_init_state()
 st.title("Travel Content Generator")
 
 # Input for API key
@@ -45,20 +243,19 @@ api_key = st.text_input("Enter your API key:", type="password")
 # Model selection
 selected_model = st.selectbox(
     "Select Model",
-    list(MODELS.keys()),
+    CONFIG["model_keys"],
     index=0  # Default to first option (Claude)
 )
 
+# Stream output token-by-token (requires an SSE-capable endpoint)
+stream_output = st.toggle("Stream")
+
 # Endpoint selection
 selected_endpoint = st.selectbox(
     "Select Content Type",
-    list(ENDPOINTS.keys())
+    CONFIG["endpoint_keys"]
 )
 
-# Initialize session state for storing form values
-if 'form_values' not in st.session_state:
-    st.session_state.form_values = {}
-
 # Input fields based on selected endpoint
 if selected_endpoint == "Generate Free Format Content":
     # Required field for free format
@@ -83,22 +280,68 @@ else:
     with col2:
         trip_end_date = st.date_input("Trip End Date")
 
-# Optional fields in expander
-with st.expander("Optional Client Information", expanded=False):
-    client_age = st.number_input("Client Age", min_value=0, max_value=120, value=0)
-    number_of_trips = st.number_input("Number of Previous Trips", min_value=0, value=0)
-    days_to_birthday = st.number_input("Days to Birthday", min_value=0, value=0)
-    places_visited = st.text_input(
-        "Places Visited (comma-separated)",
-        help="Enter places separated by commas, e.g.: Paris, Rome, Tokyo"
-    )
-    client_since = st.number_input("Client Since (years)", min_value=0, value=0)
+# Optional fields in expander, isolated so editing them only reruns this fragment
+@st.fragment
+def client_info_fragment():
+    with st.expander("Optional Client Information", expanded=False):
+        st.number_input("Client Age", min_value=0, max_value=120, value=0, key="client_age")
+        st.number_input("Number of Previous Trips", min_value=0, value=0, key="number_of_trips")
+        st.number_input("Days to Birthday", min_value=0, value=0, key="days_to_birthday")
+        st.text_input(
+            "Places Visited (comma-separated)",
+            help="Enter places separated by commas, e.g.: Paris, Rome, Tokyo",
+            key="places_visited"
+        )
+        st.number_input("Client Since (years)", min_value=0, value=0, key="client_since")
+
+client_info_fragment()
+
+# Read back through the widget keys, which a full rerun sees even after fragment-only reruns
+client_age = st.session_state.client_age
+number_of_trips = st.session_state.number_of_trips
+days_to_birthday = st.session_state.days_to_birthday
+places_visited = st.session_state.places_visited
+client_since = st.session_state.client_since
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _parse_places(s: str) -> list[str]:
+    return [p for p in (t.strip() for t in s.split(",")) if p]
+
+def _validation_error():
+    # Catch requests the API would reject anyway, without spending a round trip
+    if trip_end_date < trip_start_date:
+        return "Trip end date cannot be before the trip start date."
+    if len(destination_name) > MAX_DESTINATION_LENGTH:
+        return f"Destination name must be at most {MAX_DESTINATION_LENGTH} characters."
+    if selected_endpoint == "Generate Free Format Content" and len(prompt) > MAX_PROMPT_LENGTH:
+        return f"Prompt must be at most {MAX_PROMPT_LENGTH} characters."
+    if len(places_visited) > MAX_PLACES_VISITED_LENGTH:
+        return f"Places visited must be at most {MAX_PLACES_VISITED_LENGTH} characters."
+    return None
 
-# Add session state initialization for tracking generation state
-if 'content_generated' not in st.session_state:
-    st.session_state.content_generated = False
-if 'generated_content' not in st.session_state:
-    st.session_state.generated_content = None
+def _model_fields():
+    # Add model_id if LLama is selected
+    if (model_id := MODELS[selected_model]):  # If model_id is not None
+        return {"model_id": model_id}
+    return {}
+
+def _build_payload(base):
+    optional = {
+        "client_age": client_age,
+        "number_of_trips": number_of_trips,
+        "days_to_birthday": days_to_birthday,
+        "client_since": client_since
+    }
+    data = {
+        **base,
+        "user_id": "streamlit",
+        "user_type": "normal",
+        **{k: v for k, v in optional.items() if v > 0},
+        **_model_fields()
+    }
+    if places_visited:
+        data["places_visited"] = _parse_places(places_visited)
+    return data
 
 # Generate button
 if st.button("Generate Content"):
@@ -108,108 +351,143 @@ if st.button("Generate Content"):
         st.error("Please enter a prompt.")
     elif selected_endpoint != "Generate Free Format Content" and not destination_name:
         st.error("Please enter a destination name.")
+    elif (error := _validation_error()):
+        st.error(error)
     else:
         with st.spinner('Generating content...'):
             # Prepare the data payload
             if selected_endpoint == "Generate Free Format Content":
-                data = {
-                    "prompt": prompt,
-                    "user_id": "streamlit",  # Add these two parameters
-                    "user_type": "normal"
-                }
+                base = {"prompt": prompt}
                 # Add optional destination and dates if provided
                 if destination_name:
-                    data["destination_name"] = destination_name
+                    base["destination_name"] = destination_name
                 if trip_start_date:
-                    data["trip_start_date"] = trip_start_date.strftime('%Y-%m-%d')
+                    base["trip_start_date"] = trip_start_date.isoformat()
                 if trip_end_date:
-                    data["trip_end_date"] = trip_end_date.strftime('%Y-%m-%d')
+                    base["trip_end_date"] = trip_end_date.isoformat()
             else:
-                data = {
+                base = {
                     "destination_name": destination_name,
-                    "trip_start_date": trip_start_date.strftime('%Y-%m-%d'),
-                    "trip_end_date": trip_end_date.strftime('%Y-%m-%d'),
-                    "user_id": "streamlit",  # Add these two parameters
-                    "user_type": "normal"
+                    "trip_start_date": trip_start_date.isoformat(),
+                    "trip_end_date": trip_end_date.isoformat()
                 }
-
-            # Add model_id if LLama is selected
-            if MODELS[selected_model]:  # If model_id is not None
-                data["model_id"] = MODELS[selected_model]
-
-            # Add optional fields
-            if client_age > 0:
-                data["client_age"] = client_age
-            if number_of_trips > 0:
-                data["number_of_trips"] = number_of_trips
-            if days_to_birthday > 0:
-                data["days_to_birthday"] = days_to_birthday
-            if places_visited:
-                data["places_visited"] = [place.strip() for place in places_visited.split(",") if place.strip()]
-            if client_since > 0:
-                data["client_since"] = client_since
+            data = _build_payload(base)
 
             # Store current form values
             st.session_state.form_values = data.copy()
 
-            # Call API and get response
-            response = call_api(ENDPOINTS[selected_endpoint], data, api_key)
-
-            if "error" in response:
-                st.error(f"Error: {response['error']}")
-            else:
-                st.success("Content generated successfully!")
-                st.session_state.content_generated = True
-                st.session_state.generated_content = response.get("result", "No content available")
-                
+            if stream_output:
                 st.subheader("Generated Content")
-                st.write(st.session_state.generated_content)
-
-                with st.expander("View Raw Response"):
-                    st.json(response)
-
-# Feedback section
-if st.session_state.content_generated:
-    st.markdown("---")
-    st.subheader("Feedback Section")
-    feedback = st.text_area("Please provide your feedback for improving the content:", height=100)
-    
-    # In the feedback section, when regenerating content:
-    if st.button("Regenerate with Feedback"):
-        if not feedback:
-            st.warning("Please provide feedback before regenerating.")
-        else:
-            with st.spinner('Regenerating content with feedback...'):
-                # Get the original data from session state
-                data = st.session_state.form_values.copy()
-                
-                # Add feedback-related fields and user parameters
-                data.update({
-                    "generated_content": st.session_state.generated_content,
-                    "user_feedback": feedback,
-                    "user_id": "streamlit",  # Add these two parameters
-                    "user_type": "normal"
-                })
-
-                # Add model_id if LLama is selected
-                if MODELS[selected_model]:
-                    data["model_id"] = MODELS[selected_model]
-
-                # Call API with feedback
+                try:
+                    # write_stream appends each chunk instead of re-rendering the whole text
+                    full_text = st.write_stream(call_api_stream(ENDPOINTS[selected_endpoint], data, api_key))
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    st.error(f"Error: {e}")
+                else:
+                    st.success("Content generated successfully!")
+                    st.session_state.content_generated = True
+                    st.session_state.resp_cache.clear()
+                    st.session_state.generated_content = full_text or "No content available"
+            else:
+                # Call API and get response
                 response = call_api(ENDPOINTS[selected_endpoint], data, api_key)
 
                 if "error" in response:
                     st.error(f"Error: {response['error']}")
                 else:
-                    st.success("Content regenerated successfully!")
+                    st.success("Content generated successfully!")
+                    st.session_state.content_generated = True
+                    st.session_state.resp_cache.clear()
                     st.session_state.generated_content = response.get("result", "No content available")
-                    
-                    st.subheader("Updated Content")
+                
+                    st.subheader("Generated Content")
                     st.write(st.session_state.generated_content)
 
                     with st.expander("View Raw Response"):
                         st.json(response)
 
+# Generate several content types concurrently from the same inputs
+if selected_endpoint != "Generate Free Format Content":
+    selected_endpoints = st.multiselect(
+        "Generate All (runs the selected content types in parallel)",
+        CONFIG["batch_endpoint_keys"]
+    )
+
+    if st.button("Generate All", disabled=not selected_endpoints):
+        if not api_key:
+            st.error("Please enter your API key.")
+        elif not destination_name:
+            st.error("Please enter a destination name.")
+        elif (error := _validation_error()):
+            st.error(error)
+        else:
+            with st.spinner('Generating content...'):
+                data = _build_payload({
+                    "destination_name": destination_name,
+                    "trip_start_date": trip_start_date.isoformat(),
+                    "trip_end_date": trip_end_date.isoformat()
+                })
+                results = run_async(_post_all(
+                    get_aio_session(),
+                    [ENDPOINTS[e] for e in selected_endpoints],
+                    data,
+                    api_key
+                ))
+
+            for tab, response in zip(st.tabs(selected_endpoints), results):
+                with tab:
+                    if isinstance(response, BaseException):
+                        st.error(f"Error: {response}")
+                    elif "error" in response:
+                        st.error(f"Error: {response['error']}")
+                    else:
+                        st.write(response.get("result", "No content available"))
+
+                        with st.expander("View Raw Response"):
+                            st.json(response)
+
+# Feedback section, isolated so typing feedback does not rerun the Generate path
+@st.fragment
+def feedback_fragment(endpoint, api_key, model_fields):
+    if st.session_state.content_generated:
+        st.markdown("---")
+        st.subheader("Feedback Section")
+        feedback = st.text_area("Please provide your feedback for improving the content:", height=100)
+    
+        # In the feedback section, when regenerating content:
+        if st.button("Regenerate with Feedback"):
+            if not feedback:
+                st.warning("Please provide feedback before regenerating.")
+            else:
+                with st.spinner('Regenerating content with feedback...'):
+                    # Get the original data from session state, minus the model it was
+                    # generated with so the currently selected model is the one sent
+                    data = {k: v for k, v in st.session_state.form_values.items() if k != "model_id"}
+                
+                    # Add feedback-related fields and the currently selected model
+                    data.update({
+                        "generated_content": st.session_state.generated_content,
+                        "user_feedback": feedback,
+                        **model_fields
+                    })
+
+                    # Call API with feedback off the Streamlit thread
+                    response = regenerate(endpoint, data, api_key)
+
+                    if "error" in response:
+                        st.error(f"Error: {response['error']}")
+                    else:
+                        st.success("Content regenerated successfully!")
+                        st.session_state.generated_content = response.get("result", "No content available")
+                    
+                        st.subheader("Updated Content")
+                        st.write(st.session_state.generated_content)
+
+                        with st.expander("View Raw Response"):
+                            st.json(response)
+
+feedback_fragment(ENDPOINTS[selected_endpoint], api_key, _model_fields())
+
 # Add helpful information
 st.markdown("---")
 st.markdown("""